@@ -1,15 +1,52 @@
+import numpy as np
 import pandas as pd
+import pyarrow as pa
+import pyarrow.csv as pacsv
 import typer
-from jonckheere_test import jonckheere_test
 from rich.console import Console
 from rich.table import Table
+from scipy.special import ndtr
 
-# 引入 statsmodels 用于 FDR 校正
-from statsmodels.stats.multitest import multipletests
+from ._jt_kernel import EXACT_MAX_N, jt_batch, jt_exact_pvalue, null_moments
 
 app = typer.Typer()
 console = Console()
 
+
+def _dedupe_columns(names: list[str]) -> list[str]:
+    """与 pandas.read_csv 一致，将重复列名依次重命名为 name.1、name.2 ..."""
+    seen: dict[str, int] = {}
+    existing = set(names)
+    out = []
+    for name in names:
+        if name in seen:
+            cur = seen[name]
+            while f"{name}.{cur}" in existing:
+                cur += 1
+            seen[name] = cur + 1
+            new_name = f"{name}.{cur}"
+            existing.add(new_name)
+            out.append(new_name)
+        else:
+            seen[name] = 1
+            out.append(name)
+    return out
+
+
+def fdr_bh(pvals: np.ndarray, alpha: float) -> tuple[np.ndarray, np.ndarray]:
+    """Benjamini-Hochberg FDR 校正，返回 (q 值, 是否拒绝原假设)。"""
+    p = np.asarray(pvals, dtype=np.float64)
+    m = p.size
+    order = np.argsort(p)
+    # 按秩放大 p 值，再从尾部累计取最小值保证单调
+    q = p[order] * m / np.arange(1, m + 1)
+    q = np.minimum.accumulate(q[::-1])[::-1]
+    q = np.clip(q, 0, 1)
+    out = np.empty_like(q)
+    out[order] = q
+    return out, out < alpha
+
+
 @app.command()
 def jt_test(
     csv_file: str = typer.Argument(..., help="CSV 文件路径"),
@@ -29,51 +66,87 @@ def jt_test(
         "two_sided", "--alt", help="假设检验方向 ('two_sided', 'greater'->increasing, 'less'->decreasing)"
     ),
     fdr_alpha: float = typer.Option(0.05, "--fdr", help="FDR 显著性阈值 (默认 0.05)"),
-    # 注意：移除了 continuity 参数，因为新包不接受此参数
+    continuity: bool = typer.Option(
+        False, "--continuity", help="Z 统计量是否使用连续性校正"
+    ),
+    exact: bool = typer.Option(
+        True,
+        "--exact/--no-exact",
+        help=f"有效样本量 ≤{EXACT_MAX_N} 且无结的变量使用精确零分布计算 P 值",
+    ),
 ):
     """
     批量执行 Jonckheere-Terpstra 趋势检验，并进行 FDR (Benjamini-Hochberg) 校正。
+
+    P 值默认采用正态近似（结校正方差）；有效样本量 ≤100 且无结的变量改用精确零分布，
+    可用 --no-exact 关闭。Z_statistic 始终为正态近似下的 Z 值。
     """
     # ... [读取数据和验证列的代码保持不变] ...
-    # 1. 读取数据
+    # 1. 读取数据（Arrow 多线程解析）
+    # 分组列按文本读取，保证 "01"、"1.0" 等标签与 --order 原样比较
     try:
-        df = pd.read_csv(csv_file)
+        tbl = pacsv.read_csv(
+            csv_file,
+            read_options=pacsv.ReadOptions(use_threads=True),
+            convert_options=pacsv.ConvertOptions(
+                column_types={group_column: pa.string()}
+            ),
+        )
     except Exception as e:
         console.print(f"[bold red]读取 CSV 失败:[/bold red] {e}")
         raise typer.Exit(code=1)
 
+    # 重复列名按 pandas 的方式去重，保证每列都能按名称选取
+    tbl = tbl.rename_columns(_dedupe_columns(tbl.column_names))
+
     # 2. 验证列
-    if group_column not in df.columns:
+    if group_column not in tbl.column_names:
         console.print(f"[bold red]错误:[/bold red] 列 '{group_column}' 不存在。")
         raise typer.Exit(code=1)
 
-    # 3. 处理分组
-    ordered_groups = [g.strip() for g in group_order.split(",")]
-
-    # 过滤数据并设置 Categorical 顺序
-    df_filtered = df[df[group_column].isin(ordered_groups)].copy()
-    df_filtered[group_column] = pd.Categorical(
-        df_filtered[group_column], categories=ordered_groups, ordered=True
-    )
-
-    # 4. 筛选数值列
+    # 3. 筛选数值列（直接读取 Arrow schema）
     cols_to_exclude = [group_column]
-    if id_column in df.columns:
+    if id_column in tbl.column_names:
         cols_to_exclude.append(id_column)
 
-    value_columns = df_filtered.select_dtypes(include=["number"]).columns.tolist()
-    target_columns = [col for col in value_columns if col not in cols_to_exclude]
+    target_columns = [
+        field.name
+        for field in tbl.schema
+        if (pa.types.is_floating(field.type) or pa.types.is_integer(field.type))
+        and field.name not in cols_to_exclude
+    ]
 
     if not target_columns:
         console.print("[bold yellow]警告:[/bold yellow] 没有找到数值列用于分析。")
         raise typer.Exit()
 
+    # 4. 处理分组
+    ordered_groups = [g.strip() for g in group_order.split(",")]
+
+    # 用二分查找把分组映射为整数编码，不在顺序中的分组被过滤
+    groups_arr = np.asarray(ordered_groups)
+    sorter = np.argsort(groups_arr)
+    group_col = tbl[group_column]
+    raw = group_col.fill_null("").to_numpy(zero_copy_only=False).astype(str)
+    pos = np.searchsorted(groups_arr, raw, sorter=sorter)
+    codes = sorter[pos.clip(max=len(groups_arr) - 1)]
+    valid = (groups_arr[codes] == raw) & group_col.is_valid().to_numpy(
+        zero_copy_only=False
+    )
+    if not valid.any():
+        console.print(
+            f"[bold red]错误:[/bold red] 列 '{group_column}' 中"
+            f"没有与 --order 匹配的行，现有分组示例: {np.unique(raw)[:5].tolist()}"
+        )
+        raise typer.Exit(code=1)
+    g_all = codes[valid].astype(np.min_scalar_type(len(groups_arr)))
+
     console.print(
         f"正在分析 [bold green]{len(target_columns)}[/bold green] 个变量，分组顺序: {ordered_groups}"
     )
 
     # === 修改开始：映射参数 ===
-    # 将旧的参数习惯映射到新包要求的参数值
+    # 将旧的参数习惯映射到内核使用的检验方向
     alt_map = {
         "two_sided": "two-sided",
         "two-sided": "two-sided",
@@ -85,72 +158,100 @@ def jt_test(
     jt_alternative = alt_map.get(alternative, "two-sided")
     # === 修改结束 ===
 
-    # 5. 循环计算 Raw P-value
-    results = []
-
+    # 5. 批量计算 Raw P-value
     # 进度条表格预览（仅显示 Raw P）
     preview_table = Table(title="Test Progress (Preview)")
     preview_table.add_column("Variable", style="cyan")
     preview_table.add_column("Raw P-value", justify="right", style="magenta")
 
-    with typer.progressbar(target_columns, label="Processing") as progress:
-        for col in progress:
-            try:
-                # 提取非空数据
-                current_data = df_filtered[[col, group_column]].dropna()
-
-                if len(current_data) == 0:
-                    continue
-
-                x = current_data[col].values
-                g = current_data[group_column].cat.codes.values
-
-                # === 修改开始：调用新包 ===
-                # 新包返回的是一个对象，而不是元组
-                # 参数名变为 groups，移除了 continuity
-                result_obj = jonckheere_test(
-                    x,
-                    groups=g,
-                    alternative=jt_alternative
-                )
-
-                # 从对象中提取属性
-                jtrsum = result_obj.statistic
-                pval = result_obj.p_value
-                # z_score 可能在 exact 模式下为 None，处理一下以防报错
-                zstat = result_obj.z_score if result_obj.z_score is not None else 0
-                # === 修改结束 ===
-
-                results.append(
-                    {
-                        "Variable": col,
-                        "JTR_Sum": jtrsum,
-                        "Z_statistic": zstat,
-                        "P_value_Raw": pval,  # 原始 P 值
-                    }
-                )
-
-                if len(results) <= 5:
-                    preview_table.add_row(col, f"{pval:.4f}")
-
-            except Exception:
-                # 忽略计算错误的列（例如全为空值）
-                continue
+    # 数值矩阵只提取一次，交给内核一次性完成所有列；
+    # 普通 to_pandas 合并为 float64 块（整数列的空值转为 NaN），再按行掩码筛选
+    values_2d = tbl.select(target_columns).to_pandas().to_numpy(dtype=np.float64)
+    values_2d = values_2d[valid]
+
+    # 检验前置条件：非空、至少观测到两个分组、取值不恒定
+    observed = ~np.isnan(values_2d)
+    # (变量, 分组) 的有效样本量，精确检验也按它查找零分布
+    counts_by_group = np.column_stack(
+        [observed[g_all == k].sum(axis=0) for k in range(len(ordered_groups))]
+    )
+    counts_per_col = counts_by_group.sum(axis=1)
+    groups_per_col = (counts_by_group > 0).sum(axis=1)
+    col_min = np.where(observed, values_2d, np.inf).min(axis=0, initial=np.inf)
+    col_max = np.where(observed, values_2d, -np.inf).max(axis=0, initial=-np.inf)
+    has_variance = col_max > col_min
+    testable = (counts_per_col > 0) & (groups_per_col >= 2) & has_variance
+    test_idx = np.flatnonzero(testable)
+
+    n_skipped = len(target_columns) - len(test_idx)
+    if n_skipped:
+        console.print(
+            f"[bold yellow]跳过 {n_skipped} 个变量[/bold yellow]"
+            "（全为空值、有效分组不足两个或取值恒定）"
+        )
+
+    # 分组样本量及原假设下的均值、方差与变量无关，只计算一次
+    n_k = np.bincount(g_all, minlength=len(ordered_groups)).astype(np.float64)
+    mu, var0 = null_moments(n_k)
+
+    with console.status("Processing"):
+        jtr_all, z_all, sigma_all, tied = jt_batch(
+            values_2d[:, test_idx], g_all, n_k, mu, var0
+        )
+
+    # 对整个 Z 数组一次性计算 P 值；连续性校正始终朝远离拒绝域的方向移动 0.5
+    if jt_alternative == "increasing":
+        if continuity:
+            z_all = z_all - 0.5 / sigma_all
+        p_all = ndtr(-z_all)
+    elif jt_alternative == "decreasing":
+        if continuity:
+            z_all = z_all + 0.5 / sigma_all
+        p_all = ndtr(z_all)
+    else:
+        # 双侧检验：|JTR - mu| 减去 0.5，但不越过 0
+        if continuity:
+            z_all = np.sign(z_all) * np.maximum(np.abs(z_all) - 0.5 / sigma_all, 0.0)
+        p_all = 2.0 * ndtr(-np.abs(z_all))
+
+    # 小样本且无结的变量改用精确零分布；零分布与组的顺序无关，
+    # 各组样本量排序后相同的变量共用一次查表
+    if exact:
+        use_exact = np.flatnonzero(~tied & (counts_per_col[test_idx] <= EXACT_MAX_N))
+        sizes = np.sort(counts_by_group[test_idx[use_exact]], axis=1)
+        designs, inverse = np.unique(sizes, axis=0, return_inverse=True)
+        inverse = inverse.ravel()
+        for d, design in enumerate(designs):
+            cols = use_exact[inverse == d]
+            group_sizes = tuple(int(n) for n in design if n > 0)
+            p_all[cols] = jt_exact_pvalue(jtr_all[cols], group_sizes, jt_alternative)
+
+    # 内核输出已是按列预分配的数组，直接组装结果，无需逐行构造字典
+    var_names = np.array(target_columns, dtype=object)[test_idx]
+    for col, pval in zip(var_names[:5], p_all[:5], strict=True):
+        preview_table.add_row(col, f"{pval:.4f}")
 
     # ... [后续 FDR 计算和保存结果的代码保持不变] ...
     # 6. 计算 FDR (Benjamini-Hochberg)
-    results_df = pd.DataFrame(results)
+    results_df = pd.DataFrame(
+        {
+            "Variable": var_names,
+            "JTR_Sum": jtr_all,
+            "Z_statistic": z_all,
+            "P_value_Raw": p_all,  # 原始 P 值
+        }
+    )
 
     if not results_df.empty:
-        reject, pvals_corrected, _, _ = multipletests(
-            results_df["P_value_Raw"], alpha=fdr_alpha, method="fdr_bh"
-        )
+        p = results_df["P_value_Raw"].to_numpy()
+        q, reject = fdr_bh(p, fdr_alpha)
 
-        results_df["FDR"] = pvals_corrected
-        results_df[f"Sig_Raw (p<{fdr_alpha})"] = results_df["P_value_Raw"] < fdr_alpha
-        results_df[f"Sig_FDR (q<{fdr_alpha})"] = results_df["FDR"] < fdr_alpha
-
-        results_df = results_df.sort_values(by=["FDR", "P_value_Raw"])
+        # 按 (FDR, P) 排序一次，显著性标记直接由排序后的数组生成
+        order = np.lexsort((p, q))
+        results_df = results_df.iloc[order].reset_index(drop=True)
+        results_df["FDR"] = q[order]
+        results_df[f"Sig_Raw (p<{fdr_alpha})"] = p[order] < fdr_alpha
+        results_df[f"Sig_FDR (q<{fdr_alpha})"] = reject[order]
 
         n_raw_sig = results_df[f"Sig_Raw (p<{fdr_alpha})"].sum()
         n_fdr_sig = results_df[f"Sig_FDR (q<{fdr_alpha})"].sum()
@@ -178,7 +279,11 @@ def jt_test(
             "Z_statistic",
             "JTR_Sum",
         ]
-        results_df[cols].to_csv(output_file, index=False)
+        pacsv.write_csv(
+            pa.Table.from_pandas(results_df[cols], preserve_index=False),
+            output_file,
+            write_options=pacsv.WriteOptions(include_header=True),
+        )
 
         console.print(
             f"\n[bold green]Success![/bold green] Results with FDR saved to: [underline]{output_file}[/underline]"
@@ -0,0 +1,119 @@
+import itertools
+from collections import Counter
+
+import numpy as np
+import pytest
+
+from sci_tools._jt_kernel import (
+    _count_inversions,
+    jt_batch,
+    jt_exact_pvalue,
+    jt_null_pmf,
+    null_moments,
+)
+
+
+def brute_jt(x: np.ndarray, g: np.ndarray) -> tuple[float, float, float]:
+    """O(n^2) 逐对计数的 JT 统计量、Z 与结校正标准差，作为对照。"""
+    keep = ~np.isnan(x)
+    x, g = x[keep].astype(np.float64), g[keep]
+    s = 0.0
+    for i in range(len(x)):
+        for j in range(len(x)):
+            if g[i] < g[j]:
+                s += 1.0 if x[i] < x[j] else 0.5 if x[i] == x[j] else 0.0
+
+    N = float(len(x))
+    n = np.bincount(g).astype(np.float64)
+    t = np.unique(x, return_counts=True)[1].astype(np.float64)
+    mean = (N * N - np.sum(n * n)) / 4
+    var = (
+        N * (N - 1) * (2 * N + 5)
+        - np.sum(n * (n - 1) * (2 * n + 5))
+        - np.sum(t * (t - 1) * (2 * t + 5))
+    ) / 72
+    var += (
+        np.sum(n * (n - 1) * (n - 2))
+        * np.sum(t * (t - 1) * (t - 2))
+        / (36 * N * (N - 1) * (N - 2))
+    )
+    var += np.sum(n * (n - 1)) * np.sum(t * (t - 1)) / (8 * N * (N - 1))
+    return s, (s - mean) / np.sqrt(var), np.sqrt(var)
+
+
+def run_batch(X: np.ndarray, g: np.ndarray, n_groups: int) -> tuple[np.ndarray, ...]:
+    n_k = np.bincount(g, minlength=n_groups).astype(np.float64)
+    mu, var0 = null_moments(n_k)
+    return jt_batch(X, g, n_k, mu, var0)
+
+
+@pytest.mark.parametrize("dtype", [np.float64, np.float32])
+@pytest.mark.parametrize("seed", range(5))
+def test_jt_batch_matches_brute_force(seed: int, dtype: type) -> None:
+    rng = np.random.default_rng(seed)
+    n_groups = int(rng.integers(3, 6))
+    N = int(rng.integers(10, 60))
+    # 分组编码打乱顺序，不要求输入按组排列
+    g = rng.integers(0, n_groups, N).astype(np.int8)
+    X = np.column_stack(
+        [
+            rng.normal(size=N),  # 无结
+            rng.integers(0, 5, N),  # 大量结
+            rng.integers(0, 3, N) + 0.5 * g,  # 带趋势且含跨组结
+        ]
+    ).astype(dtype)
+    X[rng.random(X.shape) < 0.2] = np.nan
+
+    jtr, z, sigma, tied = run_batch(X, g, n_groups)
+    for c in range(X.shape[1]):
+        expected = brute_jt(X[:, c], g)
+        np.testing.assert_allclose(
+            [jtr[c], z[c], sigma[c]], expected, rtol=1e-12, atol=1e-12
+        )
+        x = X[~np.isnan(X[:, c]), c]
+        assert tied[c] == (len(np.unique(x)) < len(x))
+
+
+def test_jt_batch_skips_columns_with_one_group() -> None:
+    g = np.array([0, 0, 1, 1, 2, 2], dtype=np.int8)
+    X = np.array([[1.0, 1, np.nan, np.nan, np.nan, np.nan], [1, 2, 3, 4, 5, 6]]).T
+    jtr, z, sigma, _ = run_batch(X, g, 3)
+    assert np.isnan(jtr[0]) and np.isnan(z[0]) and np.isnan(sigma[0])
+    assert jtr[1] == 12
+
+
+def test_count_inversions_sorts_and_counts() -> None:
+    rng = np.random.default_rng(0)
+    arr = rng.integers(0, 10, 50).astype(np.float64)
+    expected = sum(
+        arr[i] > arr[j] for i in range(len(arr)) for j in range(i + 1, len(arr))
+    )
+    out = arr.copy()
+    assert _count_inversions(out, np.empty_like(out)) == expected
+    np.testing.assert_array_equal(out, np.sort(arr))
+
+
+def enumerate_jt_pmf(group_sizes: tuple[int, ...]) -> np.ndarray:
+    """枚举所有分组排列得到的 JT 零分布，作为对照。"""
+    labels = [k for k, n in enumerate(group_sizes) for _ in range(n)]
+    counts = Counter(
+        sum(a < b for a, b in itertools.combinations(perm, 2))
+        for perm in set(itertools.permutations(labels))
+    )
+    total = sum(counts.values())
+    return np.array([counts[s] / total for s in range(max(counts) + 1)])
+
+
+@pytest.mark.parametrize("group_sizes", [(2, 3), (3, 3), (2, 2, 2), (3, 1, 2)])
+def test_jt_null_pmf_matches_enumeration(group_sizes: tuple[int, ...]) -> None:
+    np.testing.assert_allclose(
+        jt_null_pmf(group_sizes), enumerate_jt_pmf(group_sizes), atol=1e-15
+    )
+
+
+def test_jt_exact_pvalue_tails() -> None:
+    # 2x2x2 设计，完全递增时 JT 取最大值 12，只有 1/90 种排列
+    assert jt_exact_pvalue(12, (2, 2, 2), "increasing") == pytest.approx(1 / 90)
+    assert jt_exact_pvalue(12, (2, 2, 2), "decreasing") == pytest.approx(1.0)
+    assert jt_exact_pvalue(12, (2, 2, 2), "two-sided") == pytest.approx(2 / 90)
+    assert jt_exact_pvalue(6, (2, 2, 2), "two-sided") == pytest.approx(1.0)
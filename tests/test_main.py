@@ -0,0 +1,136 @@
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import pytest
+from typer.testing import CliRunner
+
+from sci_tools.main import app, fdr_bh
+
+runner = CliRunner()
+
+
+def run_jt(tmp_path: Path, csv_text: str, *args: str) -> pd.DataFrame:
+    csv_file = tmp_path / "input.csv"
+    csv_file.write_text(csv_text)
+    output_file = tmp_path / "output.csv"
+    result = runner.invoke(
+        app, ["jt-test", str(csv_file), "--output", str(output_file), *args]
+    )
+    assert result.exit_code == 0, result.output
+    return pd.read_csv(output_file)
+
+
+def test_numeric_group_column_with_missing_value(tmp_path: Path) -> None:
+    csv_text = "grp,v\n1,0.1\n1,0.3\n2,0.5\n2,0.4\n3,0.9\n,0.2\n4,0.8\n"
+    out = run_jt(tmp_path, csv_text, "--group-col", "grp", "--order", "1,2,3")
+    assert out["Variable"].tolist() == ["v"]
+    # 缺失分组与不在 --order 中的分组 4 均被剔除：0.1,0.3 < 0.5,0.4 < 0.9
+    assert out["JTR_Sum"].iloc[0] == 8
+
+
+def test_string_group_column_with_missing_value(tmp_path: Path) -> None:
+    csv_text = "grp,v\nb,2\na,1\n,5\nc,3\nb,2.5\na,0\n"
+    out = run_jt(tmp_path, csv_text, "--group-col", "grp", "--order", "a,b,c")
+    assert out["JTR_Sum"].iloc[0] == 8
+
+
+@pytest.mark.parametrize("labels", [("1.0", "2.0"), ("01", "02")])
+def test_group_labels_are_compared_as_text(
+    tmp_path: Path, labels: tuple[str, str]
+) -> None:
+    # 形如数字的标签不做类型推断，按 CSV 中的原文与 --order 匹配
+    lo, hi = labels
+    csv_text = f"grp,v\n{lo},1\n{lo},2\n{hi},3\n{hi},4\n"
+    out = run_jt(tmp_path, csv_text, "--group-col", "grp", "--order", f"{lo},{hi}")
+    assert out["JTR_Sum"].iloc[0] == 4
+
+
+def test_order_matching_no_rows_is_an_error(tmp_path: Path) -> None:
+    csv_file = tmp_path / "input.csv"
+    csv_file.write_text("grp,v\n01,1\n02,2\n")
+    result = runner.invoke(
+        app, ["jt-test", str(csv_file), "--group-col", "grp", "--order", "1,2"]
+    )
+    assert result.exit_code == 1
+    assert "没有与 --order 匹配的行" in result.output
+
+
+def test_untestable_columns_are_skipped(tmp_path: Path) -> None:
+    # empty 只在被剔除的分组 z 中有值，one_group 只出现在分组 a，const 取值恒定
+    csv_text = (
+        "grp,v,empty,one_group,const\na,1,,1,5\na,2,,2,5\nb,3,,,5\nb,4,,,5\nz,0,7,,5\n"
+    )
+    csv_file = tmp_path / "input.csv"
+    csv_file.write_text(csv_text)
+    output_file = tmp_path / "output.csv"
+    result = runner.invoke(
+        app,
+        ["jt-test", str(csv_file), "--output", str(output_file)]
+        + ["--group-col", "grp", "--order", "a,b"],
+    )
+    assert result.exit_code == 0, result.output
+    assert "跳过 3 个变量" in result.output
+    assert pd.read_csv(output_file)["Variable"].tolist() == ["v"]
+
+
+def test_duplicate_column_names(tmp_path: Path) -> None:
+    csv_text = "grp,v,v\na,1,3\na,2,2\nb,3,1\nb,4,0\n"
+    out = run_jt(tmp_path, csv_text, "--group-col", "grp", "--order", "a,b")
+    assert sorted(out["Variable"]) == ["v", "v.1"]
+
+
+def test_continuity_correction_is_conservative(tmp_path: Path) -> None:
+    # 含结的数据走正态近似；上升与下降两列分别位于两侧
+    csv_text = (
+        "grp,up,down\na,1,3\na,1,3\na,2,2\nb,2,2\nb,2,1\nb,3,1\nc,3,1\nc,4,0\nc,4,0\n"
+    )
+    for alt in ("two_sided", "greater", "less"):
+        args = ("--group-col", "grp", "--order", "a,b,c", "--alt", alt)
+        plain = run_jt(tmp_path, csv_text, *args).set_index("Variable")
+        corrected = run_jt(tmp_path, csv_text, *args, "--continuity")
+        corrected = corrected.set_index("Variable")
+        for col in ("up", "down"):
+            assert corrected.loc[col, "P_value_Raw"] >= plain.loc[col, "P_value_Raw"]
+
+
+def test_fdr_bh_hand_computed() -> None:
+    # 排序后 0.01,0.03,0.04,0.20 -> p*m/rank = 0.04,0.06,0.0533,0.20，再取尾部累计最小
+    p = np.array([0.01, 0.04, 0.03, 0.20])
+    q, reject = fdr_bh(p, 0.05)
+    np.testing.assert_allclose(q, [0.04, 0.16 / 3, 0.16 / 3, 0.20])
+    np.testing.assert_array_equal(reject, [True, False, False, False])
+
+
+def test_fdr_bh_clips_and_keeps_ties() -> None:
+    q, _ = fdr_bh(np.array([0.9, 0.5, 0.9, 0.95]), 0.05)
+    np.testing.assert_allclose(q, [0.95, 0.95, 0.95, 0.95])
+    q, _ = fdr_bh(np.array([0.02, 0.02]), 0.05)
+    np.testing.assert_allclose(q, [0.02, 0.02])
+
+
+def test_small_tie_free_sample_uses_exact_pvalue(tmp_path: Path) -> None:
+    # 2x2x2 完全递增：精确 P 值为 1/90，正态近似会给出不同结果
+    csv_text = "grp,v\na,1\na,2\nb,3\nb,4\nc,5\nc,6\n"
+    args = ("--group-col", "grp", "--order", "a,b,c", "--alt", "greater")
+    exact = run_jt(tmp_path, csv_text, *args)
+    assert exact["P_value_Raw"].iloc[0] == pytest.approx(1 / 90)
+    approx = run_jt(tmp_path, csv_text, *args, "--no-exact")
+    assert approx["P_value_Raw"].iloc[0] != pytest.approx(1 / 90)
+
+
+def test_output_csv_format(tmp_path: Path) -> None:
+    # pyarrow 写出：表头与字符串加引号，布尔值为 true/false，整数值的 JTR 不带小数
+    csv_text = "grp,v,w\na,1,6\na,2,5\nb,3,4\nb,4,3\nc,5,2\nc,6,1\n"
+    run_jt(
+        tmp_path, csv_text, "--group-col", "grp", "--order", "a,b,c", "--alt", "greater"
+    )
+    header, *rows = (tmp_path / "output.csv").read_text().splitlines()
+    assert header == (
+        '"Variable","P_value_Raw","FDR","Sig_FDR (q<0.05)","Z_statistic","JTR_Sum"'
+    )
+    fields = [row.split(",") for row in rows]
+    assert [(f[0], f[3], f[5]) for f in fields] == [
+        ('"v"', "true", "12"),
+        ('"w"', "false", "0"),
+    ]